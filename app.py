@@ -10,25 +10,47 @@ The @app.route decorator tells Flask which URL triggers which function.
 """
 
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask.json.provider import JSONProvider
 from flask_login import login_required, current_user
-from database import init_db, add_item, get_all_items, get_item, get_item_by_tmdb, \
+from flask_caching import Cache
+from jinja2 import FileSystemBytecodeCache
+from database import init_db, add_item, add_items_bulk, get_all_items, get_item, get_items_by_tmdb_bulk, \
     update_item_status, update_item_details, delete_item, \
-    get_cached_providers, save_providers, is_provider_cache_fresh
-from tmdb import search_multi, get_providers, search_single
-from config import TMDB_IMAGE_BASE
+    get_cached_providers, get_fresh_providers, save_providers, \
+    get_cached_providers_bulk, is_provider_cache_fresh_bulk, \
+    get_provider_snapshot, save_provider_snapshot, clear_provider_snapshots, \
+    clear_provider_snapshots_for_title, close_db
+from tmdb import search_multi, get_providers, search_single_batch, logo_url
+from config import TMDB_IMAGE_BASE, JINJA_CACHE_DIR, CACHE_TYPE, CACHE_DIR
 from auth import init_auth
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import click
+import orjson
+import os
+import sys
 
 
 # Tier/plan suffixes that TMDB appends to provider names.
 # We strip these so "Netflix Standard with Ads" and "Netflix Basic"
 # both appear as just "Netflix" in the filter chips.
-_PROVIDER_SUFFIXES = re.compile(
-    r"\s+(standard with ads|basic with ads|with ads|standard|basic|premium|"
-    r"select|essentials|kids)\s*$",
-    re.IGNORECASE,
+# Lowercase, and longest first so "standard with ads" wins over "with ads".
+_PROVIDER_SUFFIXES = (
+    " standard with ads",
+    " basic with ads",
+    " with ads",
+    " standard",
+    " basic",
+    " premium",
+    " select",
+    " essentials",
+    " kids",
 )
 
+# The same handful of provider names come up over and over on every page
+# load, so the helpers below remember their answers (provider names are
+# plain strings, so caching them is safe).
+@lru_cache(maxsize=2048)
 def normalize_provider_name(name):
     """
     Strip plan/tier suffixes from a TMDB provider name.
@@ -40,25 +62,43 @@ def normalize_provider_name(name):
     Note: "plus" is intentionally NOT stripped because it appears in
     real brand names like "Disney Plus".
     """
-    return _PROVIDER_SUFFIXES.sub("", name).strip()
+    name = name.strip()
+    lowered = name.lower()
+    for suffix in _PROVIDER_SUFFIXES:
+        if lowered.endswith(suffix):
+            return name[:-len(suffix)].strip()
+    return name
 
 
 # TMDB uses different names in different regions.
 # Map raw (normalized) TMDB names to the display name we want in the chips.
-_PROVIDER_DISPLAY_NAMES = {
+# Names are interned (here, in the whitelist below, and in what
+# canonical_provider_name returns) so set/dict lookups between them can
+# match on identity before comparing characters.
+_PROVIDER_DISPLAY_NAMES = {sys.intern(raw): sys.intern(display) for raw, display in {
     "Apple TV":    "Apple TV+",   # UK TMDB name for the Apple subscription service
     "Disney Plus": "Disney+",     # UK TMDB name for Disney+
-}
+}.items()}
 
 def canonical_provider_name(raw_name):
     """Normalize a raw TMDB provider name, then apply display-name overrides."""
+    # Known services (every base name + tier suffix) are a single lookup
+    canonical = _CANON_TABLE.get(raw_name.lower())
+    if canonical is None:
+        canonical = _canonical_provider_name_slow(raw_name)
+    return canonical
+
+
+@lru_cache(maxsize=2048)
+def _canonical_provider_name_slow(raw_name):
+    """canonical_provider_name() for names that aren't in _CANON_TABLE."""
     normalized = normalize_provider_name(raw_name)
-    return _PROVIDER_DISPLAY_NAMES.get(normalized, normalized)
+    return sys.intern(_PROVIDER_DISPLAY_NAMES.get(normalized, normalized))
 
 
 # Only show filter chips for these mainstream subscription services.
 # Names here should match what canonical_provider_name() produces.
-STREAMING_WHITELIST = {
+STREAMING_WHITELIST = frozenset(sys.intern(name) for name in (
     "Netflix",
     "Amazon Prime Video",
     "Disney+",
@@ -75,16 +115,77 @@ STREAMING_WHITELIST = {
     "Max",
     "Hulu",
     "Peacock",
-}
+))
+
+
+def _build_canon_table():
+    """
+    Pre-compute canonical names for every whitelisted service.
+
+    Maps each lowercased "<base name><tier suffix>" combination (e.g.
+    "netflix standard with ads", "disney plus") straight to its display
+    name, so the common case skips suffix-stripping altogether.
+    """
+    table = {}
+    for base in STREAMING_WHITELIST | set(_PROVIDER_DISPLAY_NAMES):
+        display = _PROVIDER_DISPLAY_NAMES.get(base, base)
+        for suffix in ("",) + _PROVIDER_SUFFIXES:
+            table[base.lower() + suffix] = display
+    return table
+
+
+_CANON_TABLE = _build_canon_table()
+
+
+# Background work the user shouldn't have to wait for — e.g. fetching
+# providers for a title they just added.  The page returns straight away
+# and the providers are there by the next time the list is viewed.
+_BG_POOL = ThreadPoolExecutor(max_workers=4)
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    jsonify() (e.g. the live search results) goes through this, and
+    orjson's C serializer is several times faster than the built-in json.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_json_default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _json_default(obj):
+    """Handle the odd type orjson doesn't know about (e.g. Markup)."""
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 # Create the Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Cache compiled templates on disk so new worker processes don't have to
+# recompile them.  (Flask already turns off template auto-reloading unless
+# the app is running in debug mode.)
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, mode=0o700, exist_ok=True)
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR),
+}
+
+# {{ p.provider_logo | logo_url }} — we store TMDB's path for each logo and
+# pick our own copy or TMDB's URL when the page is shown
+app.add_template_filter(logo_url)
 
 # Secret key for sessions and flash messages.
 # In production (PythonAnywhere), set this as an environment variable.
 # Locally, the fallback "dev-secret-key" is fine for development.
-import os
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-key")
 
 # Tell Flask it's behind a reverse proxy (PythonAnywhere uses HTTPS,
@@ -94,6 +195,21 @@ app.config["PREFERRED_URL_SCHEME"] = os.environ.get("PREFERRED_URL_SCHEME", "htt
 from werkzeug.middleware.proxy_fix import ProxyFix
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# Cache for data that is expensive to rebuild on every page view (the
+# user's list, provider lookups).  Entries are cleared whenever the
+# underlying data changes — see _invalidate_items().
+if CACHE_TYPE == "FileSystemCache":
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+cache = Cache(app, config={
+    "CACHE_TYPE": CACHE_TYPE,
+    "CACHE_DIR": CACHE_DIR,
+    "CACHE_DEFAULT_TIMEOUT": 60,
+})
+
+# Each request borrows one database connection (on first use) and
+# hands it back to the pool when the request is finished
+app.teardown_appcontext(close_db)
+
 # Set up Google Sign-In and Flask-Login
 # This registers the /login, /login/google, /auth/callback, and /logout routes
 init_auth(app)
@@ -113,55 +229,41 @@ def index():
     Also supports filtering by streaming provider and media type.
     """
     # Pass current_user.id so we only get THIS user's items
-    items = get_all_items(current_user.id)
+    all_items = _items_for(current_user.id)
     provider_filter = request.args.get("provider", "")
     media_filter = request.args.get("media", "")  # "movie", "tv", or "" (all)
 
     # Filter by media type if a tab is selected
     if media_filter in ("movie", "tv"):
-        for status in items:
-            items[status] = [i for i in items[status] if i["media_type"] == media_filter]
+        all_items = [i for i in all_items if i["media_type"] == media_filter]
 
     # Collect all unique streaming providers BEFORE applying the provider filter,
     # so the chips don't disappear when one is selected.
-    # We normalize names (strip tier suffixes) so "Netflix Standard with Ads"
-    # and "Netflix Basic" both collapse to "Netflix".
-    # provider_logos: {canonical_name: logo_url}
-    # Build a provider map for every item, fetching from TMDB if not yet cached.
-    # We store the result so we don't call get_cached_providers twice per item.
-    item_providers = {}  # (tmdb_id, media_type) -> [provider rows]
-    all_items_flat = [item for status in items for item in items[status]]
-    for item in all_items_flat:
-        key = (item["tmdb_id"], item["media_type"])
-        if key not in item_providers:
-            item_providers[key] = _get_or_fetch_providers(item["tmdb_id"], item["media_type"])
-
-    # Collect unique streaming chips from every item's providers.
-    provider_logos = {}
-    for providers in item_providers.values():
-        for p in providers:
-            if p["provider_type"] == "stream":
-                canonical = canonical_provider_name(p["provider_name"])
-                if canonical in STREAMING_WHITELIST and canonical not in provider_logos:
-                    provider_logos[canonical] = p["provider_logo"]
-
-    # Apply the provider filter for the displayed items.
-    if provider_filter:
-        for status in items:
-            filtered = []
-            for item in items[status]:
-                key = (item["tmdb_id"], item["media_type"])
-                canonical_names = [
-                    canonical_provider_name(p["provider_name"])
-                    for p in item_providers.get(key, [])
-                    if p["provider_type"] == "stream"
-                ]
-                if provider_filter in canonical_names:
-                    filtered.append(item)
-            items[status] = filtered
-
-    # Sorted list of (name, logo_url) tuples for the template
-    all_providers = sorted(provider_logos.items())
+    # The chip row only changes when the list (or its providers) changes, so
+    # it's kept as a per-user snapshot in the database.  With a warm snapshot
+    # and no provider filter selected we skip the provider lookups entirely.
+    snapshot_key = media_filter if media_filter in ("movie", "tv") else ""
+    all_providers = get_provider_snapshot(current_user.id, snapshot_key)
+
+    if all_providers is None or provider_filter:
+        provider_logos, stream_canon = _stream_providers_for(all_items)
+
+        if all_providers is None:
+            # Sorted list of (name, logo) tuples for the template
+            all_providers = sorted(provider_logos.items())
+            save_provider_snapshot(current_user.id, snapshot_key, all_providers)
+
+        # Apply the provider filter for the displayed items.
+        if provider_filter:
+            all_items = [
+                item for item in all_items
+                if provider_filter in stream_canon.get((item["tmdb_id"], item["media_type"]), ())
+            ]
+
+    # Split into the three sections on the page (order within each is kept)
+    items = {"want": [], "progress": [], "watched": []}
+    for item in all_items:
+        items[item["status"]].append(item)
 
     return render_template(
         "index.html",
@@ -184,13 +286,7 @@ def search():
     results = []
 
     if query:
-        results = search_multi(query)
-
-        # Mark results that are already on THIS user's watchlist
-        for r in results:
-            existing = get_item_by_tmdb(current_user.id, r["tmdb_id"], r["media_type"])
-            r["on_list"] = existing is not None
-            r["list_id"] = existing["id"] if existing else None
+        results = _search_for(current_user.id, query)
 
     return render_template("search.html", query=query, results=results)
 
@@ -208,15 +304,13 @@ def api_search():
     results = []
 
     if query:
-        results = search_multi(query)
+        results = _search_for(current_user.id, query)
 
-        # Mark results that are already on THIS user's watchlist
-        for r in results:
-            existing = get_item_by_tmdb(current_user.id, r["tmdb_id"], r["media_type"])
-            r["on_list"] = existing is not None
-            r["list_id"] = existing["id"] if existing else None
-
-    return jsonify({"results": results})
+    # Tag the response with an ETag so the browser can revalidate it;
+    # if nothing changed we send back an empty 304 instead of the results.
+    response = jsonify({"results": results})
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @app.route("/add", methods=["POST"])
@@ -235,19 +329,22 @@ def add():
     poster_path = request.form.get("poster_path")
     overview = request.form.get("overview")
 
+    success = False
     if tmdb_id and media_type and title:
         # Pass current_user.id so the item is linked to this user
         success = add_item(current_user.id, tmdb_id, media_type, title, year, poster_path, overview)
         if success:
-            # Fetch and cache streaming providers right away
-            _refresh_providers(tmdb_id, media_type)
+            _invalidate_items(current_user.id)
+            clear_provider_snapshots(current_user.id)
+            # Fetch and cache streaming providers in the background
+            _BG_POOL.submit(_refresh_providers, tmdb_id, media_type)
             flash(f"Added '{title}' to your list!", "success")
         else:
             flash(f"'{title}' is already on your list.", "info")
 
     # If the request came from JavaScript (fetch), return JSON
     # so the overlay can update the button without reloading
-    if request.headers.get("X-Requested-With") == "fetch":
+    if _is_xhr():
         return jsonify({"success": success})
 
     return redirect(url_for("index"))
@@ -278,7 +375,7 @@ def detail(item_id):
     # Group providers by type for display
     grouped_providers = {"stream": [], "rent": [], "buy": []}
     for p in providers:
-        ptype = p.get("provider_type", p.get("type", "stream"))
+        ptype = p["provider_type"]
         if ptype in grouped_providers:
             grouped_providers[ptype].append(p)
 
@@ -303,6 +400,11 @@ def update(item_id):
 
     if new_status in ("want", "progress", "watched"):
         update_item_status(item_id, new_status)
+        _invalidate_items(current_user.id)
+
+        # JavaScript callers update the page themselves — nothing to render
+        if _is_xhr():
+            return "", 204
 
         # Pretty labels for the flash message
         labels = {"want": "Want to Watch", "progress": "In Progress", "watched": "Watched"}
@@ -328,6 +430,9 @@ def update_details(item_id):
         rating = max(1, min(10, rating))
 
     update_item_details(item_id, rating=rating, notes=notes if notes else None)
+    _invalidate_items(current_user.id)
+    if _is_xhr():
+        return "", 204
     flash("Details updated.", "success")
     return redirect(url_for("detail", item_id=item_id))
 
@@ -342,6 +447,10 @@ def delete(item_id):
         return redirect(url_for("index"))
 
     delete_item(item_id)
+    _invalidate_items(current_user.id)
+    clear_provider_snapshots(current_user.id)
+    if _is_xhr():
+        return "", 204
     flash(f"Removed '{item['title']}' from your list.", "success")
     return redirect(url_for("index"))
 
@@ -367,15 +476,11 @@ def import_search():
     raw_text = request.form.get("titles", "")
     titles = [line.strip() for line in raw_text.splitlines() if line.strip()]
 
-    matches = []
-    for title in titles:
-        result = search_single(title)
-        if result:
-            existing = get_item_by_tmdb(current_user.id, result["tmdb_id"], result["media_type"])
-            result["on_list"] = existing is not None
-            matches.append({"query": title, "match": result})
-        else:
-            matches.append({"query": title, "match": None})
+    # Search for every title at once rather than one after another
+    results = search_single_batch(titles)
+
+    _mark_on_list([r for r in results if r], current_user.id)
+    matches = [{"query": title, "match": result} for title, result in zip(titles, results)]
 
     return render_template("import.html", matches=matches, raw_text=raw_text)
 
@@ -392,16 +497,21 @@ def import_add():
     poster_paths = request.form.getlist("poster_path")
     overviews = request.form.getlist("overview")
 
-    added_count = 0
-    for i in range(len(tmdb_ids)):
-        success = add_item(
-            current_user.id, int(tmdb_ids[i]), media_types[i], titles[i],
-            years[i], poster_paths[i], overviews[i]
-        )
-        if success:
-            _refresh_providers(int(tmdb_ids[i]), media_types[i])
-            added_count += 1
-
+    # Insert everything in one transaction, then fetch providers for the
+    # newly added titles in the background
+    rows = [
+        (int(tmdb_ids[i]), media_types[i], titles[i], years[i], poster_paths[i], overviews[i])
+        for i in range(len(tmdb_ids))
+    ]
+    added = add_items_bulk(current_user.id, rows)
+    new_titles = [row[:2] for row, success in zip(rows, added) if success]
+    for tmdb_id, media_type in new_titles:
+        _BG_POOL.submit(_refresh_providers, tmdb_id, media_type)
+
+    added_count = len(new_titles)
+    if added_count:
+        _invalidate_items(current_user.id)
+        clear_provider_snapshots(current_user.id)
     flash(f"Added {added_count} item(s) to your list!", "success")
     return redirect(url_for("index"))
 
@@ -410,12 +520,107 @@ def import_add():
 # Helper functions
 # -----------------------------------------------------------------------
 
+def _is_xhr():
+    """
+    True if this request was sent by our JavaScript (fetch) rather than a
+    normal form submit. Those callers update the page themselves, so we
+    can skip the redirect and the full page render that would follow it.
+    """
+    return request.headers.get("X-Requested-With") in ("fetch", "XMLHttpRequest")
+
+
+@cache.memoize(60)
+def _items_for(user_id):
+    """A user's watchlist (see get_all_items), cached until it changes."""
+    # The cache pickles what we store, and sqlite3.Row can't be pickled
+    return [dict(row) for row in get_all_items(user_id)]
+
+
+def _invalidate_items(user_id):
+    """Forget cached list data after the user adds, edits or removes something."""
+    cache.delete_memoized(_items_for, user_id)
+    cache.delete_memoized(_search_for)
+
+
+# Streaming availability rarely changes, so keep lookups for a day
+# (_refresh_providers clears the entry whenever it re-fetches).
+@cache.memoize(24 * 60 * 60)
 def _get_or_fetch_providers(tmdb_id, media_type):
     """Get providers from cache, or fetch fresh from TMDB if stale."""
-    if is_provider_cache_fresh(tmdb_id, media_type):
-        return get_cached_providers(tmdb_id, media_type)
+    providers = get_fresh_providers(tmdb_id, media_type)
+    if not providers:
+        providers = _refresh_providers(tmdb_id, media_type)
+    # Plain dicts, because the cache pickles them (see _items_for)
+    return [dict(p) for p in providers]
+
+
+def _stream_providers_for(items):
+    """
+    Work out streaming providers for a list of watchlist items.
+
+    Returns (provider_logos, stream_canon):
+    - provider_logos: {canonical_name: logo} for whitelisted services
+    - stream_canon: {(tmdb_id, media_type): frozenset of canonical names}
+
+    We normalize names (strip tier suffixes) so "Netflix Standard with Ads"
+    and "Netflix Basic" both collapse to "Netflix".
+    """
+    # Build a provider map for every item, fetching from TMDB if not yet cached.
+    # Freshness and lookup are each one query for the whole list, rather than
+    # two queries per item.
+    keys = {(item["tmdb_id"], item["media_type"]) for item in items}
+    for tmdb_id, media_type in is_provider_cache_fresh_bulk(keys):
+        _refresh_providers(tmdb_id, media_type)
+    item_providers = get_cached_providers_bulk(keys)  # (tmdb_id, media_type) -> [provider rows]
+
+    # Walk every item's stream providers once, collecting both the chips
+    # (whitelisted names + a logo for each) and, per item, the set of
+    # canonical names the provider filter checks against.
+    provider_logos = {}
+    stream_canon = {}
+    for key, providers in item_providers.items():
+        names = set()
+        for p in providers:
+            if p["provider_type"] == "stream":
+                canonical = canonical_provider_name(p["provider_name"])
+                names.add(canonical)
+                if canonical in STREAMING_WHITELIST and canonical not in provider_logos:
+                    provider_logos[canonical] = p["provider_logo"]
+        stream_canon[key] = frozenset(names)
+
+    return provider_logos, stream_canon
+
+
+@cache.memoize(30)
+def _search_for(user_id, query):
+    """
+    search_multi() results for a user, with on_list flags set.
+
+    Cached for a short while because the live search asks for the same
+    query repeatedly as people type and retype; cleared (for everyone)
+    whenever a list changes so the flags stay right.
+    """
+    results = search_multi(query)
+
+    # Mark results that are already on THIS user's watchlist
+    _mark_on_list(results, user_id)
+    return results
+
+
+def _mark_on_list(results, user_id):
+    """
+    Flag TMDB search results that are already on the user's list.
+
+    Sets on_list / list_id on each result, using one query for the batch.
+    """
+    existing = get_items_by_tmdb_bulk(
+        user_id, {(r.tmdb_id, r.media_type) for r in results}
+    )
+    for r in results:
+        item = existing.get((r.tmdb_id, r.media_type))
+        r.on_list = item is not None
+        r.list_id = item["id"] if item else None
 
-    return _refresh_providers(tmdb_id, media_type)
 
 
 def _refresh_providers(tmdb_id, media_type):
@@ -423,9 +628,29 @@ def _refresh_providers(tmdb_id, media_type):
     providers = get_providers(tmdb_id, media_type)
     if providers:
         save_providers(tmdb_id, media_type, providers)
+        cache.delete_memoized(_get_or_fetch_providers, tmdb_id, media_type)
+        # Everyone with this title on their list needs their chips rebuilt
+        clear_provider_snapshots_for_title(tmdb_id, media_type)
     return get_cached_providers(tmdb_id, media_type)
 
 
+# -----------------------------------------------------------------------
+# Command line
+# -----------------------------------------------------------------------
+
+@app.cli.command("init-db")
+def init_db_command():
+    """
+    Create the database tables.
+
+    Run this once when deploying (and again after pulling schema changes):
+        flask --app app init-db
+    Web workers don't do it themselves, so starting them is just an import.
+    """
+    init_db()
+    click.echo("Database is ready.")
+
+
 # -----------------------------------------------------------------------
 # Run the app
 # -----------------------------------------------------------------------
@@ -434,7 +659,12 @@ if __name__ == "__main__":
     # Create database tables on first run
     init_db()
 
-    # debug=True auto-reloads when you change code (development only!)
+    # Debug mode auto-reloads when you change code, and shows an interactive
+    # debugger on errors — which anyone who can reach the app could use to
+    # run code, so it's off unless you ask for it:
+    #     FLASK_DEBUG=1 python app.py    (or FLASK_ENV=development)
     # host='0.0.0.0' makes the app accessible from other devices on your Wi-Fi
     # port 5001 avoids conflict with macOS AirPlay on port 5000
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    debug = (os.environ.get("FLASK_DEBUG") == "1"
+             or os.environ.get("FLASK_ENV") == "development")
+    app.run(debug=debug, host='0.0.0.0', port=5001)
@@ -15,9 +15,13 @@ Libraries used:
 - flask-login: Manages user sessions (who's logged in)
 """
 
-from flask import Blueprint, redirect, url_for, flash, session
+from flask import Blueprint, redirect, url_for, flash, session, g, request, current_app
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user
-from authlib.integrations.flask_client import OAuth
+from authlib.common.errors import AuthlibBaseError
+from authlib.integrations.flask_client import OAuth, FlaskOAuth2App
+from authlib.integrations.requests_client import OAuth2Session
+from requests import RequestException
+from requests.adapters import HTTPAdapter
 from database import get_or_create_user, get_user
 from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET
 
@@ -28,9 +32,42 @@ auth_bp = Blueprint("auth", __name__)
 # OAuth client — handles the Google sign-in protocol
 oauth = OAuth()
 
+# Authlib opens (and closes) a fresh HTTP session for every call to Google,
+# so each sign-in would pay for new TCP + TLS handshakes.  Instead, all
+# sessions share this adapter, which keeps connections to Google open
+# between sign-ins.
+_GOOGLE_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+
+
+class _PooledOAuth2Session(OAuth2Session):
+    """An Authlib session that sends its requests through _GOOGLE_ADAPTER."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mount("https://", _GOOGLE_ADAPTER)
+
+    def close(self):
+        # Authlib closes the session after each call — leave the shared
+        # adapter (and its open connections) alone when it does
+        for adapter in self.adapters.values():
+            if adapter is not _GOOGLE_ADAPTER:
+                adapter.close()
+
+
+class _GoogleOAuthApp(FlaskOAuth2App):
+    """The Google OAuth client, using pooled sessions."""
+    client_cls = _PooledOAuth2Session
+
 # Flask-Login manager — tracks who's logged in
 login_manager = LoginManager()
 
+# The rendered login page, kept after the first time (see login())
+_login_html = None
+
+# The demo user's database row, remembered after the first demo login so
+# later ones don't need to touch the database (see demo_login)
+_DEMO_USER = None
+
 
 class User(UserMixin):
     """
@@ -43,8 +80,13 @@ class User(UserMixin):
 
     UserMixin provides sensible defaults for all of these.
     """
+    # Store the fields in fixed slots rather than a per-object dict.
+    # (UserMixin has no __slots__, so Python still allows a __dict__, but
+    # it stays empty and is never allocated for these fields.)
+    __slots__ = ("id", "google_id", "email", "name", "picture")
+
     def __init__(self, user_data):
-        # user_data is a dict from the database (id, google_id, email, name, picture)
+        # user_data is the user's database row (id, google_id, email, name, picture)
         self.id = user_data["id"]
         self.google_id = user_data["google_id"]
         self.email = user_data["email"]
@@ -59,11 +101,23 @@ def load_user(user_id):
 
     It looks up the user ID stored in the session cookie and returns
     a User object (or None if the user doesn't exist).
+
+    The answer is remembered on flask.g for the rest of the request, so
+    if Flask-Login asks again we don't go back to the database.
     """
+    # CSS, JS and images are the same for everyone — don't look up the
+    # user for them (a page can pull in a dozen static files)
+    if request.path.startswith(current_app.static_url_path + "/"):
+        return None
+
+    cache = g.setdefault("_user_cache", {})
+    if user_id in cache:
+        return cache[user_id]
+
     user_data = get_user(int(user_id))
-    if user_data:
-        return User(user_data)
-    return None
+    user = User(user_data) if user_data else None
+    cache[user_id] = user
+    return user
 
 
 def init_auth(app):
@@ -93,6 +147,7 @@ def init_auth(app):
         client_id=GOOGLE_CLIENT_ID,
         client_secret=GOOGLE_CLIENT_SECRET,
         server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        client_cls=_GoogleOAuthApp,  # Reuse connections to Google (see above)
         client_kwargs={
             # "openid" = basic auth, "email" = email address, "profile" = name & picture
             "scope": "openid email profile"
@@ -114,7 +169,17 @@ def login():
         return redirect(url_for("index"))
 
     from flask import render_template
-    return render_template("login.html")
+
+    # The page is the same for every signed-out visitor, so render it once
+    # and reuse the HTML.  Not when there are flash messages to show (they
+    # are part of the page), and not in debug mode, where templates are
+    # reloaded as you edit them.
+    global _login_html
+    if session.get("_flashes") or current_app.debug:
+        return render_template("login.html")
+    if _login_html is None:
+        _login_html = render_template("login.html")
+    return _login_html
 
 
 @auth_bp.route("/login/google")
@@ -141,35 +206,41 @@ def callback():
     try:
         # Exchange the authorization code for an access token
         token = oauth.google.authorize_access_token()
+    except (AuthlibBaseError, RequestException):
+        # Google said no (bad/expired code, state mismatch, user cancelled),
+        # the ID token it sent didn't check out (bad nonce, expired claims —
+        # Authlib's JoseError, which isn't an OAuthError), or we couldn't
+        # reach it — show an error and go back to login.
+        # Anything else is a bug, and Flask's error handling should see it.
+        flash("Sign-in failed. Please try again.", "error")
+        return redirect(url_for("auth.login"))
 
-        # Get the user's profile info from the token
-        # (Google includes it in the ID token as part of OpenID Connect)
-        user_info = token.get("userinfo")
-
-        if not user_info:
-            flash("Could not get your Google profile. Please try again.", "error")
-            return redirect(url_for("auth.login"))
+    # Get the user's profile info from the token
+    # (Google includes it in the ID token as part of OpenID Connect)
+    user_info = token.get("userinfo")
 
-        # Find or create this user in our database
-        user_data = get_or_create_user(
-            google_id=user_info["sub"],        # "sub" is Google's unique user ID
-            email=user_info["email"],
-            name=user_info.get("name", ""),
-            picture=user_info.get("picture", ""),
-        )
+    try:
+        google_id = user_info["sub"]    # "sub" is Google's unique user ID
+        email = user_info["email"]
+    except (TypeError, KeyError):
+        # No profile at all (None), or it's missing the fields we need
+        flash("Could not get your Google profile. Please try again.", "error")
+        return redirect(url_for("auth.login"))
 
-        # Log the user in (creates a session cookie)
-        user = User(user_data)
-        login_user(user)
+    # Find or create this user in our database
+    user_data = get_or_create_user(
+        google_id=google_id,
+        email=email,
+        name=user_info.get("name", ""),
+        picture=user_info.get("picture", ""),
+    )
 
-        flash(f"Welcome, {user.name}!", "success")
-        return redirect(url_for("index"))
+    # Log the user in (creates a session cookie)
+    user = User(user_data)
+    login_user(user)
 
-    except Exception as e:
-        # If anything goes wrong (network error, invalid code, etc.),
-        # show an error and redirect back to the login page
-        flash("Sign-in failed. Please try again.", "error")
-        return redirect(url_for("auth.login"))
+    flash(f"Welcome, {user.name}!", "success")
+    return redirect(url_for("index"))
 
 
 @auth_bp.route("/login/demo")
@@ -186,15 +257,17 @@ def demo_login():
         flash("Demo login is only available in development mode.", "error")
         return redirect(url_for("auth.login"))
 
-    # Create or find the demo user
-    user_data = get_or_create_user(
-        google_id="demo-user-local",
-        email="demo@localhost",
-        name="Demo User",
-        picture="",
-    )
+    # Create or find the demo user (only the first time — it never changes)
+    global _DEMO_USER
+    if _DEMO_USER is None:
+        _DEMO_USER = get_or_create_user(
+            google_id="demo-user-local",
+            email="demo@localhost",
+            name="Demo User",
+            picture="",
+        )
 
-    user = User(user_data)
+    user = User(_DEMO_USER)
     login_user(user)
 
     flash("Signed in as Demo User.", "success")
@@ -22,6 +22,20 @@ TMDB_BASE_URL = "https://api.themoviedb.org/3"
 # Base URL for poster images (w500 = 500px wide — good balance of quality/speed)
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 
+# Where TMDB API responses are cached (a SQLite file next to app.py), so
+# repeating a search doesn't go back over the network.
+TMDB_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmdb_cache")
+
+# Optional: keep that cache in Redis instead (e.g. "redis://localhost:6379/0"),
+# so every worker process — and every server — shares one cache.  Needs
+# `pip install redis`.  Leave empty to use the SQLite file above.
+TMDB_CACHE_REDIS_URL = os.environ.get("TMDB_CACHE_REDIS_URL", "")
+
+# TMDB allows roughly 40 requests every 10 seconds per IP.  We pace our own
+# requests to stay under that, rather than hitting it and waiting out 429s.
+TMDB_RATE_LIMIT = int(os.environ.get("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_PERIOD = 10  # seconds
+
 # --- Google OAuth -------------------------------------------------------
 # These come from the Google Cloud Console (APIs & Services → Credentials).
 # Set them as environment variables so they never appear in source code.
@@ -32,9 +46,33 @@ GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET", "")
 # Path to the SQLite database file (sits next to app.py)
 DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlist.db")
 
+# --- Templates ----------------------------------------------------------
+# Where Jinja keeps compiled template bytecode, so a restarted worker can
+# skip recompiling index.html and friends on its first request.  Leave it
+# unset to use Jinja's own folder, which is private to the user running the
+# app (the files are loaded as code, so nobody else may be able to write
+# there).  If you do set it, it's created readable by you only.
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR") or None
+
+# --- Caching ------------------------------------------------------------
+# Flask-Caching backend for per-user page data.  "SimpleCache" lives inside
+# each worker process; if you run several workers, switch to
+# "FileSystemCache" so they all see the same (and the same invalidations).
+CACHE_TYPE = os.environ.get("CACHE_TYPE", "SimpleCache")
+# FileSystemCache unpickles whatever it finds in this folder, so it sits
+# next to app.py (not in the shared temp dir) and is readable by you only.
+CACHE_DIR = os.environ.get(
+    "CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "page_cache")
+)
+
 # --- Streaming providers ------------------------------------------------
 # Country code for streaming availability (GB = United Kingdom)
 PROVIDER_COUNTRY = "GB"
 
+# Provider logos are downloaded once into this folder and served from our
+# own /static URL, instead of every browser fetching them from TMDB.
+PROVIDER_LOGO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "providers")
+PROVIDER_LOGO_URL = "/static/providers/"
+
 # How many days before we re-fetch streaming data for a title
 PROVIDER_CACHE_DAYS = 7
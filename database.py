@@ -5,88 +5,290 @@ Uses SQLite — a simple file-based database built into Python.
 No server to install, no password to configure.  The entire database
 lives in a single file called watchlist.db.
 
+Read helpers hand back sqlite3.Row objects as they come from the
+database: they work like read-only dicts (row["title"]) without the cost
+of copying every row into a new dict.
+
 Key concept: We use a context manager (get_db) so the database
-connection is automatically closed when we're done with it.
+connection is automatically handed back when we're done with it.
+During a web request, every helper shares the same connection; it is
+handed back once the request is over (see close_db).
 """
 
+import json
+import queue
 import sqlite3
-from datetime import datetime
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from flask import g, has_app_context
 from config import DATABASE
 
 
-def get_db():
+# Open connections are kept in a small pool and reused, rather than
+# opening (and re-reading the schema of) a new one for every query.
+# A reused connection also keeps its page cache warm between requests.
+_POOL_SIZE = 5
+_pool = queue.LifoQueue(maxsize=_POOL_SIZE)
+
+# SQL for "the current time", used for every added/updated/fetched date.
+# SQLite works it out itself, so we don't build a Python datetime for each
+# write.  Same shape and timezone as datetime.now().isoformat() (local
+# time, "2024-05-01T18:30:00.123"), so dates sort correctly next to rows
+# written before this was used.  New tables also get it as the column
+# DEFAULT, but writes still spell it out because older database files
+# were created without one.
+_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# The queries that run on (nearly) every page.  sqlite3 keeps a cache of
+# prepared statements per connection, keyed by the exact SQL text, so
+# sharing one string per query means it is parsed once per connection
+# and reused after that.
+_SQL_GET_USER = "SELECT * FROM users WHERE id = ?"
+_SQL_GET_ITEM = "SELECT * FROM items WHERE id = ?"
+_SQL_GET_ALL_ITEMS = "SELECT * FROM items WHERE user_id = ? ORDER BY updated_date DESC"
+_SQL_GET_PROVIDERS = """SELECT * FROM providers
+                        WHERE tmdb_id = ? AND media_type = ?
+                        ORDER BY provider_type, provider_name"""
+_SQL_GET_FRESH_PROVIDERS = """SELECT * FROM providers
+                              WHERE tmdb_id = ? AND media_type = ?
+                                AND julianday('now', 'localtime') - julianday(fetched_date) < ?
+                              ORDER BY provider_type, provider_name"""
+
+
+def _db_uri(mode):
+    """
+    The database file as a "file:" URI, so we can say how to open it:
+    "ro" = read-only, "rw" = read/write (but never create the file).
+    """
+    return f"{Path(DATABASE).resolve().as_uri()}?mode={mode}"
+
+
+def _connect():
     """
-    Open a connection to the SQLite database.
+    Open a new connection to the SQLite database.
+
+    The file must already exist — init_db() creates it — so a missing
+    database is an error rather than a silently empty new one.
 
     row_factory = sqlite3.Row  lets us access columns by name
     instead of by number.  So instead of row[1] we can write row["title"].
     """
-    conn = sqlite3.connect(DATABASE)
+    # check_same_thread=False because pooled connections get reused by
+    # whichever thread asks next (only one thread uses one at a time).
+    # cached_statements: room for every distinct query we run (the bulk
+    # lookups vary in length, so they take up several slots).
+    conn = sqlite3.connect(_db_uri("rw"), uri=True, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row      # Access columns by name
     conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
+    # These settings only last for this connection, so every new one needs
+    # them.  (WAL mode itself is saved in the database file — see init_db.)
+    # NORMAL sync is safe in WAL mode while doing far fewer fsyncs per commit.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA cache_size = -20000")      # ~20 MB page cache
+    conn.execute("PRAGMA temp_store = MEMORY")      # Sorts/temp tables in RAM
+    conn.execute("PRAGMA mmap_size = 134217728")    # Read up to 128 MB via mmap
     return conn
 
 
+def _borrow():
+    """Take a connection from the pool, or open a new one if it's empty."""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _connect()
+
+
+def _release(conn):
+    """Hand a connection back to the pool (or close it if the pool is full)."""
+    # Never hand a half-finished transaction to the next borrower
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+@contextmanager
+def get_db():
+    """
+    Borrow a database connection from the pool.
+
+    Use it as  `with get_db() as conn:`.  Inside a web request the
+    connection is kept on flask.g, so loading the user, the watchlist and
+    the providers all reuse one connection; close_db() returns it to the
+    pool when the request ends.  Outside a request (startup, background
+    threads) it goes back into the pool at the end of the block.
+    """
+    if has_app_context():
+        conn = g.get("_db")
+        if conn is None:
+            conn = g._db = _borrow()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+        return
+
+    conn = _borrow()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+
+def close_db(exception=None):
+    """
+    Return this request's connection to the pool.
+
+    Registered with app.teardown_appcontext, so Flask calls it for us at
+    the end of every request.
+    """
+    conn = g.pop("_db", None)
+    if conn is not None:
+        _release(conn)
+
+
+# Older SQLite builds allow at most 999 "?" placeholders per query, so the
+# bulk lookups below send long lists of titles in batches of this many.
+_KEYS_PER_QUERY = 400
+
+
+def _key_batches(keys):
+    """
+    Split (tmdb_id, media_type) pairs into query-sized batches.
+
+    Yields (placeholders, params) for each batch, ready for
+    WHERE (tmdb_id, media_type) IN (VALUES {placeholders}).
+    """
+    keys = list(keys)
+    for start in range(0, len(keys), _KEYS_PER_QUERY):
+        batch = keys[start:start + _KEYS_PER_QUERY]
+        placeholders = ", ".join(["(?, ?)"] * len(batch))
+        params = [value for key in batch for value in key]
+        yield placeholders, params
+
+
+# The whole schema, run as one script the first time the database is set
+# up.  Bump _SCHEMA_VERSION whenever you change it, so existing databases
+# run the script again (everything here is "IF NOT EXISTS", so that's safe).
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+-- users table: each person who signs in with Google
+CREATE TABLE IF NOT EXISTS users (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    google_id     TEXT NOT NULL UNIQUE,    -- Google's unique user ID
+    email         TEXT NOT NULL,
+    name          TEXT,                    -- Display name from Google
+    picture       TEXT,                    -- Profile picture URL from Google
+    created_date  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+);
+
+-- items table: each movie/show on a user's watchlist.
+-- The user_id column links each item to the user who added it.
+CREATE TABLE IF NOT EXISTS items (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id       INTEGER NOT NULL,        -- Which user owns this item
+    tmdb_id       INTEGER NOT NULL,
+    media_type    TEXT NOT NULL,            -- 'movie' or 'tv'
+    title         TEXT NOT NULL,
+    year          TEXT,                     -- Release year
+    poster_path   TEXT,                     -- Path to poster image on TMDB
+    overview      TEXT,                     -- Plot summary
+    status        TEXT NOT NULL DEFAULT 'want',  -- 'want', 'progress', or 'watched'
+    rating        INTEGER,                  -- Your rating 1-10 (optional)
+    notes         TEXT,                     -- Your personal notes (optional)
+    added_date    TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+    updated_date  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+    UNIQUE(user_id, tmdb_id, media_type),  -- Same user can't add the same title twice
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- providers table: cached streaming availability.
+-- This data is shared (not per-user) since streaming info is the same for everyone.
+CREATE TABLE IF NOT EXISTS providers (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    tmdb_id        INTEGER NOT NULL,
+    media_type     TEXT NOT NULL,
+    provider_name  TEXT NOT NULL,
+    provider_logo  TEXT,                    -- Path to logo image on TMDB (e.g. /abc123.jpg)
+    provider_type  TEXT NOT NULL,            -- 'flatrate' (stream), 'rent', or 'buy'
+    country        TEXT NOT NULL DEFAULT 'GB',
+    fetched_date   TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+);
+
+-- user_provider_snapshots table: the home page's filter chips.
+-- A pre-computed [[name, logo], ...] list per user (and per
+-- media tab), so the home page doesn't have to rebuild it from every
+-- item's providers on each visit.  Rows are deleted when stale.
+CREATE TABLE IF NOT EXISTS user_provider_snapshots (
+    user_id       INTEGER NOT NULL,
+    media_filter  TEXT NOT NULL DEFAULT '',  -- '', 'movie' or 'tv'
+    payload_json  TEXT NOT NULL,
+    updated_date  TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')),
+    PRIMARY KEY (user_id, media_filter),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Indexes: let SQLite jump straight to the rows it needs.
+-- A user's list, already in "most recently updated" order:
+CREATE INDEX IF NOT EXISTS idx_items_user_updated
+    ON items(user_id, updated_date DESC);
+-- Every provider lookup filters by title (and sorts by type, name):
+CREATE INDEX IF NOT EXISTS idx_providers_title
+    ON providers(tmdb_id, media_type, provider_type, provider_name);
+-- (Looking up one title on a user's list already uses the index
+-- SQLite builds for UNIQUE(user_id, tmdb_id, media_type).)
+"""
+
+
+def _schema_version():
+    """
+    Which schema version the database file has (0 if there's no file yet).
+
+    Opens the file read-only, so checking takes no write lock — every
+    worker process can do it at startup without queueing behind the others.
+    """
+    try:
+        conn = sqlite3.connect(_db_uri("ro"), uri=True)
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        return 0  # No database file yet (or it can't be read)
+
+
 def init_db():
     """
     Create the database tables if they don't exist yet.
 
-    This runs every time the app starts, but CREATE TABLE IF NOT EXISTS
-    means it only actually creates the tables the very first time.
+    This runs every time the app starts.  The database remembers which
+    schema version it has (PRAGMA user_version), so after the very first
+    start this is a single read-only check and nothing else.
     """
-    conn = get_db()
+    if _schema_version() >= _SCHEMA_VERSION:
+        return
 
-    # --- users table: each person who signs in with Google ---
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id            INTEGER PRIMARY KEY AUTOINCREMENT,
-            google_id     TEXT NOT NULL UNIQUE,    -- Google's unique user ID
-            email         TEXT NOT NULL,
-            name          TEXT,                    -- Display name from Google
-            picture       TEXT,                    -- Profile picture URL from Google
-            created_date  TEXT NOT NULL
-        )
-    """)
-
-    # --- items table: each movie/show on a user's watchlist ---
-    # The user_id column links each item to the user who added it.
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS items (
-            id            INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id       INTEGER NOT NULL,        -- Which user owns this item
-            tmdb_id       INTEGER NOT NULL,
-            media_type    TEXT NOT NULL,            -- 'movie' or 'tv'
-            title         TEXT NOT NULL,
-            year          TEXT,                     -- Release year
-            poster_path   TEXT,                     -- Path to poster image on TMDB
-            overview      TEXT,                     -- Plot summary
-            status        TEXT NOT NULL DEFAULT 'want',  -- 'want', 'progress', or 'watched'
-            rating        INTEGER,                  -- Your rating 1-10 (optional)
-            notes         TEXT,                     -- Your personal notes (optional)
-            added_date    TEXT NOT NULL,
-            updated_date  TEXT NOT NULL,
-            UNIQUE(user_id, tmdb_id, media_type),  -- Same user can't add the same title twice
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    """)
-
-    # --- providers table: cached streaming availability ---
-    # This data is shared (not per-user) since streaming info is the same for everyone.
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS providers (
-            id             INTEGER PRIMARY KEY AUTOINCREMENT,
-            tmdb_id        INTEGER NOT NULL,
-            media_type     TEXT NOT NULL,
-            provider_name  TEXT NOT NULL,
-            provider_logo  TEXT,                    -- Path to logo image on TMDB
-            provider_type  TEXT NOT NULL,            -- 'flatrate' (stream), 'rent', or 'buy'
-            country        TEXT NOT NULL DEFAULT 'GB',
-            fetched_date   TEXT NOT NULL
+    # A normal (read/write/create) connection, separate from the pool —
+    # this is the only place the database file may be created
+    conn = sqlite3.connect(DATABASE)
+    try:
+        # WAL lets readers carry on while someone writes.  Unlike the
+        # PRAGMAs in _connect(), this is stored in the database file,
+        # so setting it once here covers every later connection.
+        conn.execute("PRAGMA journal_mode = WAL")
+
+        # All tables and indexes in one go (and one transaction), then
+        # record the version so later starts can skip all of this
+        conn.executescript(
+            f"BEGIN; {_SCHEMA} PRAGMA user_version = {_SCHEMA_VERSION}; COMMIT;"
         )
-    """)
-
-    conn.commit()
-    conn.close()
+    finally:
+        conn.close()
 
 
 # -----------------------------------------------------------------------
@@ -98,50 +300,32 @@ def get_or_create_user(google_id, email, name, picture):
     Find a user by their Google ID, or create a new one if they're signing
     in for the first time.
 
-    Returns a dict with the user's database row.
+    Returns the user's database row.
     """
-    conn = get_db()
-
-    # Check if this Google account already has a user record
-    row = conn.execute(
-        "SELECT * FROM users WHERE google_id = ?", (google_id,)
-    ).fetchone()
-
-    if row:
-        # User exists — update their name/picture in case they changed it on Google
-        conn.execute(
-            "UPDATE users SET name = ?, picture = ?, email = ? WHERE google_id = ?",
-            (name, picture, email, google_id)
-        )
-        conn.commit()
-        # Re-fetch to get updated data
+    with get_db() as conn:
+        # One "upsert" does both jobs: insert a new user, or — if this Google
+        # account already has one — update their name/picture/email in case
+        # they changed it on Google.  RETURNING hands back the finished row.
         row = conn.execute(
-            "SELECT * FROM users WHERE google_id = ?", (google_id,)
+            f"""INSERT INTO users (google_id, email, name, picture, created_date)
+               VALUES (?, ?, ?, ?, {_NOW})
+               ON CONFLICT(google_id) DO UPDATE SET
+                   email = excluded.email,
+                   name = excluded.name,
+                   picture = excluded.picture
+               RETURNING *""",
+            (google_id, email, name, picture)
         ).fetchone()
-    else:
-        # First time signing in — create a new user
-        now = datetime.now().isoformat()
-        conn.execute(
-            """INSERT INTO users (google_id, email, name, picture, created_date)
-               VALUES (?, ?, ?, ?, ?)""",
-            (google_id, email, name, picture, now)
-        )
         conn.commit()
-        row = conn.execute(
-            "SELECT * FROM users WHERE google_id = ?", (google_id,)
-        ).fetchone()
 
-    user = dict(row)
-    conn.close()
-    return user
+    return row
 
 
 def get_user(user_id):
     """Get a user by their database ID."""
-    conn = get_db()
-    row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
-    return dict(row) if row else None
+    with get_db() as conn:
+        row = conn.execute(_SQL_GET_USER, (user_id,)).fetchone()
+    return row
 
 
 # -----------------------------------------------------------------------
@@ -150,96 +334,114 @@ def get_user(user_id):
 
 def add_item(user_id, tmdb_id, media_type, title, year, poster_path, overview):
     """Add a movie/show to a user's watchlist with status 'want'."""
-    now = datetime.now().isoformat()
-    conn = get_db()
-    try:
-        conn.execute(
-            """INSERT INTO items (user_id, tmdb_id, media_type, title, year, poster_path, overview, status, added_date, updated_date)
-               VALUES (?, ?, ?, ?, ?, ?, ?, 'want', ?, ?)""",
-            (user_id, tmdb_id, media_type, title, year, poster_path, overview, now, now)
-        )
+    with get_db() as conn:
+        try:
+            conn.execute(
+                f"""INSERT INTO items (user_id, tmdb_id, media_type, title, year, poster_path, overview, status, added_date, updated_date)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 'want', {_NOW}, {_NOW})""",
+                (user_id, tmdb_id, media_type, title, year, poster_path, overview)
+            )
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            # UNIQUE constraint failed — this title is already on the user's list
+            return False
+
+
+def add_items_bulk(user_id, rows):
+    """
+    Add several titles to a user's watchlist in a single transaction.
+
+    rows is a list of (tmdb_id, media_type, title, year, poster_path, overview).
+    Returns a list of booleans, one per row: True if it was added, False if
+    it was already on the list.
+    """
+    added = []
+    with get_db() as conn:
+        for tmdb_id, media_type, title, year, poster_path, overview in rows:
+            # OR IGNORE skips titles already on the list (UNIQUE constraint);
+            # rowcount tells us whether this one was actually inserted
+            cursor = conn.execute(
+                f"""INSERT OR IGNORE INTO items (user_id, tmdb_id, media_type, title, year, poster_path, overview, status, added_date, updated_date)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 'want', {_NOW}, {_NOW})""",
+                (user_id, tmdb_id, media_type, title, year, poster_path, overview)
+            )
+            added.append(cursor.rowcount == 1)
         conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        # UNIQUE constraint failed — this title is already on the user's list
-        return False
-    finally:
-        conn.close()
+    return added
 
 
 def get_all_items(user_id):
-    """Get all watchlist items for a specific user, grouped by status."""
-    conn = get_db()
-    rows = conn.execute(
-        "SELECT * FROM items WHERE user_id = ? ORDER BY updated_date DESC",
-        (user_id,)
-    ).fetchall()
-    conn.close()
-
-    # Group into three lists for the three sections on the main page
-    grouped = {"want": [], "progress": [], "watched": []}
-    for row in rows:
-        grouped[row["status"]].append(dict(row))
+    """
+    Get all watchlist items for a specific user, most recently updated first.
 
-    return grouped
+    Returns one flat list; each item's "status" says which section it
+    belongs in.
+    """
+    with get_db() as conn:
+        rows = conn.execute(_SQL_GET_ALL_ITEMS, (user_id,)).fetchall()
+    return rows
 
 
 def get_item(item_id):
     """Get a single item by its database ID."""
-    conn = get_db()
-    row = conn.execute("SELECT * FROM items WHERE id = ?", (item_id,)).fetchone()
-    conn.close()
-    return dict(row) if row else None
+    with get_db() as conn:
+        row = conn.execute(_SQL_GET_ITEM, (item_id,)).fetchone()
+    return row
 
 
-def get_item_by_tmdb(user_id, tmdb_id, media_type):
-    """Check if a title is already on a specific user's watchlist."""
-    conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM items WHERE user_id = ? AND tmdb_id = ? AND media_type = ?",
-        (user_id, tmdb_id, media_type)
-    ).fetchone()
-    conn.close()
-    return dict(row) if row else None
+def get_items_by_tmdb_bulk(user_id, pairs):
+    """
+    Check which of several titles are already on a user's watchlist.
+
+    pairs is a collection of (tmdb_id, media_type).  Returns a dict mapping
+    each pair that IS on the list to its item row; the rest are missing.
+    """
+    found = {}
+    with get_db() as conn:
+        for placeholders, params in _key_batches(pairs):
+            rows = conn.execute(
+                f"""SELECT * FROM items
+                    WHERE user_id = ? AND (tmdb_id, media_type) IN (VALUES {placeholders})""",
+                [user_id] + params
+            ).fetchall()
+            for r in rows:
+                found[(r["tmdb_id"], r["media_type"])] = r
+    return found
 
 
 def update_item_status(item_id, new_status):
     """Change an item's status (want / progress / watched)."""
-    now = datetime.now().isoformat()
-    conn = get_db()
-    conn.execute(
-        "UPDATE items SET status = ?, updated_date = ? WHERE id = ?",
-        (new_status, now, item_id)
-    )
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute(
+            f"UPDATE items SET status = ?, updated_date = {_NOW} WHERE id = ?",
+            (new_status, item_id)
+        )
+        conn.commit()
 
 
 def update_item_details(item_id, rating=None, notes=None):
     """Update an item's rating and/or notes."""
-    now = datetime.now().isoformat()
-    conn = get_db()
-    conn.execute(
-        "UPDATE items SET rating = ?, notes = ?, updated_date = ? WHERE id = ?",
-        (rating, notes, now, item_id)
-    )
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute(
+            f"UPDATE items SET rating = ?, notes = ?, updated_date = {_NOW} WHERE id = ?",
+            (rating, notes, item_id)
+        )
+        conn.commit()
 
 
 def delete_item(item_id):
     """Remove an item from the watchlist entirely."""
-    conn = get_db()
-    # Also delete cached providers for this item
-    item = get_item(item_id)
-    if item:
+    with get_db() as conn:
+        # Also delete cached providers for this item — looked up from the
+        # item row inside the same statement, so no separate SELECT first
         conn.execute(
-            "DELETE FROM providers WHERE tmdb_id = ? AND media_type = ?",
-            (item["tmdb_id"], item["media_type"])
+            """DELETE FROM providers
+               WHERE (tmdb_id, media_type) IN (SELECT tmdb_id, media_type FROM items WHERE id = ?)""",
+            (item_id,)
         )
-    conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
-    conn.commit()
-    conn.close()
+        conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        conn.commit()
 
 
 # -----------------------------------------------------------------------
@@ -248,15 +450,35 @@ def delete_item(item_id):
 
 def get_cached_providers(tmdb_id, media_type):
     """Get cached streaming providers for a title, if still fresh."""
-    conn = get_db()
-    rows = conn.execute(
-        """SELECT * FROM providers
-           WHERE tmdb_id = ? AND media_type = ?
-           ORDER BY provider_type, provider_name""",
-        (tmdb_id, media_type)
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    with get_db() as conn:
+        rows = conn.execute(_SQL_GET_PROVIDERS, (tmdb_id, media_type)).fetchall()
+    return rows
+
+
+def get_cached_providers_bulk(keys):
+    """
+    Get cached providers for many titles in a single query (or a few,
+    for very long lists).
+
+    keys is a collection of (tmdb_id, media_type) pairs.  Returns a dict
+    mapping each pair to its list of provider rows (titles with nothing
+    cached are simply missing from the dict).
+    """
+    # SQLite supports row values, so we can match both columns at once:
+    # WHERE (tmdb_id, media_type) IN (VALUES (?, ?), (?, ?), ...)
+    grouped = defaultdict(list)
+    with get_db() as conn:
+        for placeholders, params in _key_batches(keys):
+            rows = conn.execute(
+                f"""SELECT * FROM providers
+                    WHERE (tmdb_id, media_type) IN (VALUES {placeholders})
+                    ORDER BY provider_type, provider_name""",
+                params
+            ).fetchall()
+            for r in rows:
+                grouped[(r["tmdb_id"], r["media_type"])].append(r)
+    # A plain dict, so looking up a missing title doesn't add an empty entry
+    return dict(grouped)
 
 
 def save_providers(tmdb_id, media_type, providers_list):
@@ -265,39 +487,115 @@ def save_providers(tmdb_id, media_type, providers_list):
 
     First deletes any old data for this title, then inserts fresh data.
     """
-    now = datetime.now().isoformat()
-    conn = get_db()
-
-    # Clear old data
-    conn.execute(
-        "DELETE FROM providers WHERE tmdb_id = ? AND media_type = ?",
-        (tmdb_id, media_type)
-    )
-
-    # Insert new data
-    for p in providers_list:
+    with get_db() as conn:
+        # Clear old data
         conn.execute(
-            """INSERT INTO providers (tmdb_id, media_type, provider_name, provider_logo, provider_type, country, fetched_date)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (tmdb_id, media_type, p["name"], p["logo"], p["type"], p["country"], now)
+            "DELETE FROM providers WHERE tmdb_id = ? AND media_type = ?",
+            (tmdb_id, media_type)
         )
 
-    conn.commit()
-    conn.close()
+        # Insert new data — executemany prepares the INSERT once and runs
+        # it for every provider; the DELETE and INSERTs share one commit
+        conn.executemany(
+            f"""INSERT INTO providers (tmdb_id, media_type, provider_name, provider_logo, provider_type, country, fetched_date)
+               VALUES (?, ?, ?, ?, ?, ?, {_NOW})""",
+            [(tmdb_id, media_type, p.name, p.logo, p.type, p.country)
+             for p in providers_list]
+        )
+
+        conn.commit()
+
+
+def get_fresh_providers(tmdb_id, media_type, max_age_days=7):
+    """
+    Get cached streaming providers for a title, but only if they're recent.
+
+    Returns an empty list if nothing is cached or the cache is too old —
+    either way the caller should fetch fresh data from TMDB.  The age check
+    and the load happen in one query.
+    """
+    # fetched_date is stored in local time, hence 'localtime' in the query
+    with get_db() as conn:
+        rows = conn.execute(
+            _SQL_GET_FRESH_PROVIDERS, (tmdb_id, media_type, max_age_days)
+        ).fetchall()
+    return rows
+
+
+def is_provider_cache_fresh_bulk(keys, max_age_days=7):
+    """
+    Check the provider cache for many titles in a single query.
 
+    Returns the set of (tmdb_id, media_type) pairs whose cached data is
+    missing or too old — i.e. the ones that need re-fetching from TMDB.
+    """
+    keys = set(keys)
+
+    # SQLite does the age check too, so only the fresh titles come back
+    fresh = set()
+    with get_db() as conn:
+        for placeholders, params in _key_batches(keys):
+            rows = conn.execute(
+                f"""SELECT tmdb_id, media_type
+                    FROM providers
+                    WHERE (tmdb_id, media_type) IN (VALUES {placeholders})
+                    GROUP BY tmdb_id, media_type
+                    HAVING julianday('now', 'localtime') - julianday(MIN(fetched_date)) < ?""",
+                params + [max_age_days]
+            ).fetchall()
+            fresh.update((row["tmdb_id"], row["media_type"]) for row in rows)
+    return keys - fresh
+
+
+# -----------------------------------------------------------------------
+# Provider chip snapshots (per user)
+# -----------------------------------------------------------------------
+
+def get_provider_snapshot(user_id, media_filter="", max_age_days=7):
+    """
+    Get the saved filter-chip list for a user, or None if there isn't a
+    recent one.
 
-def is_provider_cache_fresh(tmdb_id, media_type, max_age_days=7):
-    """Check if the cached provider data is still recent enough."""
-    conn = get_db()
-    row = conn.execute(
-        "SELECT fetched_date FROM providers WHERE tmdb_id = ? AND media_type = ? LIMIT 1",
-        (tmdb_id, media_type)
-    ).fetchone()
-    conn.close()
+    Snapshots expire after max_age_days so the providers behind them
+    still get refreshed from TMDB now and then.
+    """
+    with get_db() as conn:
+        row = conn.execute(
+            """SELECT payload_json FROM user_provider_snapshots
+               WHERE user_id = ? AND media_filter = ?
+                 AND julianday('now', 'localtime') - julianday(updated_date) < ?""",
+            (user_id, media_filter, max_age_days)
+        ).fetchone()
 
     if not row:
-        return False  # No cache at all
+        return None
+    return json.loads(row["payload_json"])
+
+
+def save_provider_snapshot(user_id, media_filter, chips):
+    """Save a user's filter-chip list ([(name, logo), ...])."""
+    with get_db() as conn:
+        conn.execute(
+            f"""INSERT OR REPLACE INTO user_provider_snapshots (user_id, media_filter, payload_json, updated_date)
+               VALUES (?, ?, ?, {_NOW})""",
+            (user_id, media_filter, json.dumps(chips))
+        )
+        conn.commit()
 
-    fetched = datetime.fromisoformat(row["fetched_date"])
-    age = (datetime.now() - fetched).days
-    return age < max_age_days
+
+def clear_provider_snapshots(user_id):
+    """Throw away a user's chip snapshots (their list changed)."""
+    with get_db() as conn:
+        conn.execute("DELETE FROM user_provider_snapshots WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+
+def clear_provider_snapshots_for_title(tmdb_id, media_type):
+    """Throw away the snapshots of every user who has this title (its providers changed)."""
+    with get_db() as conn:
+        conn.execute(
+            """DELETE FROM user_provider_snapshots
+               WHERE user_id IN (SELECT user_id FROM items WHERE tmdb_id = ? AND media_type = ?)""",
+            (tmdb_id, media_type)
+        )
+        conn.commit()
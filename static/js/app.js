@@ -6,6 +6,7 @@
  * - Auto-dismiss flash messages
  * - Import page checkbox toggling + inline per-row search
  * - Live search overlay
+ * - Detail page forms submitted in the background (no page reload)
  * - Service worker registration (PWA)
  */
 
@@ -433,6 +434,73 @@ document.addEventListener("DOMContentLoaded", function () {
 
 });
 
+// ===== Detail page: submit forms without reloading the page =====
+// Forms marked "async-form" are sent with fetch(). The server answers
+// "204 No Content" instead of redirecting, and we update the page here.
+// Without JavaScript the forms still work as normal submits.
+function showFlash(message, category) {
+    var container = document.querySelector("main.container");
+    if (!container) return;
+    var flash = document.createElement("div");
+    flash.className = "flash-message flash-" + (category || "success");
+    flash.setAttribute("role", "alert");
+    flash.innerHTML = escapeHtml(message) +
+        '<button class="flash-close" onclick="this.parentElement.remove()">&times;</button>';
+    container.insertBefore(flash, container.firstChild);
+    setTimeout(function () {
+        flash.style.transition = "opacity 0.3s ease";
+        flash.style.opacity = "0";
+        setTimeout(function () { flash.remove(); }, 300);
+    }, 4000);
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+    document.querySelectorAll("form.async-form").forEach(function (form) {
+        form.addEventListener("submit", function (e) {
+            e.preventDefault();
+            if (form.dataset.confirm && !confirm(form.dataset.confirm)) return;
+
+            var button = form.querySelector("button[type='submit']");
+            if (button) button.disabled = true;
+
+            fetch(form.action, {
+                method: "POST",
+                headers: { "X-Requested-With": "fetch" },
+                body: new FormData(form)
+            })
+            .then(function (res) {
+                if (!res.ok) throw new Error("Request failed");
+
+                // Delete: nothing left to show here, go back to the list
+                if (form.dataset.redirect) {
+                    window.location = form.dataset.redirect;
+                    return;
+                }
+
+                // Status change: update the pill and swap which button is hidden
+                if (form.dataset.status) {
+                    var pill = document.getElementById("statusPill");
+                    if (pill) {
+                        pill.className = "status-pill status-" + form.dataset.status;
+                        pill.textContent = form.dataset.label;
+                    }
+                    document.querySelectorAll("form[data-status]").forEach(function (f) {
+                        f.hidden = (f === form);
+                    });
+                    showFlash("Moved to '" + form.dataset.label + "'.");
+                } else if (form.dataset.message) {
+                    showFlash(form.dataset.message);
+                }
+                if (button) button.disabled = false;
+            })
+            .catch(function () {
+                // Something went wrong — fall back to a normal submit
+                form.submit();
+            });
+        });
+    });
+});
+
 // ===== PWA: Register Service Worker =====
 if ("serviceWorker" in navigator) {
     window.addEventListener("load", function () {
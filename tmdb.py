@@ -10,24 +10,175 @@ Authentication uses the v3 API key, passed as a query parameter
 from TMDB's API settings page.
 """
 
+import copy
+import os
+import threading
+import time
+import orjson
 import requests
-from config import TMDB_BASE_URL, TMDB_API_KEY, TMDB_IMAGE_BASE, PROVIDER_COUNTRY
-
-
-def _base_params():
+import requests_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote
+from urllib3.util.retry import Retry
+from config import TMDB_BASE_URL, TMDB_API_KEY, TMDB_IMAGE_BASE, PROVIDER_COUNTRY, \
+    TMDB_CACHE_PATH, TMDB_CACHE_REDIS_URL, PROVIDER_LOGO_DIR, PROVIDER_LOGO_URL, \
+    TMDB_RATE_LIMIT, TMDB_RATE_PERIOD
+
+
+# Where cached TMDB responses are kept: a local SQLite file by default, or
+# Redis if configured (shared by all workers; Redis expires old entries itself).
+if TMDB_CACHE_REDIS_URL:
+    from redis import Redis
+    _cache_backend = requests_cache.RedisCache(connection=Redis.from_url(TMDB_CACHE_REDIS_URL))
+else:
+    _cache_backend = requests_cache.SQLiteCache(TMDB_CACHE_PATH)
+
+# TMDB's image URLs without the size part ("https://image.tmdb.org/t/p"),
+# so logos can be fetched at whatever size a page needs
+_IMAGE_ROOT = TMDB_IMAGE_BASE.rsplit("/", 1)[0]
+
+# One shared HTTP session for all TMDB calls, with a response cache in front
+# of it.  A repeated search (by anyone) is answered from the cache for a
+# day, and a title's streaming providers for 6 hours; anything else for an
+# hour.  After that, or when TMDB's Cache-Control headers say so, the entry
+# is revalidated with a conditional request (If-None-Match with the stored
+# ETag, or If-Modified-Since): if nothing changed TMDB answers "304 Not
+# Modified" with no body, and the cached copy is reused and its timer reset.
+# requests-cache leaves the api_key out of the cache key and strips it from
+# stored responses.
+_session = requests_cache.CachedSession(
+    backend=_cache_backend,
+    expire_after=3600,
+    urls_expire_after={
+        f"{TMDB_BASE_URL}/search/*": 24 * 60 * 60,
+        f"{TMDB_BASE_URL}/*/watch/providers": 6 * 60 * 60,
+        # Provider logos (at any size) are saved as files instead (see logo_url)
+        f"{_IMAGE_ROOT}/*": requests_cache.DO_NOT_CACHE,
+        # The warm-up request has to really reach TMDB (see warm_up)
+        f"{TMDB_BASE_URL}/configuration": requests_cache.DO_NOT_CACHE,
+    },
+    cache_control=True,
+    allowable_methods=["GET"],
+)
+
+# How many TMDB lookups may run at once (see search_single_batch).  Kept
+# small so we stay well under TMDB's rate limit.
+_MAX_PARALLEL = 8
+
+class _RateLimitedAdapter(HTTPAdapter):
     """
-    Base query parameters included in every TMDB request.
-
-    The api_key parameter authenticates us with TMDB's v3 API.
+    An HTTPAdapter that paces requests to TMDB's API with a token bucket.
+
+    The bucket holds TMDB_RATE_LIMIT tokens and refills at
+    TMDB_RATE_LIMIT / TMDB_RATE_PERIOD tokens a second.  Each API request
+    takes one token, waiting for the next refill if the bucket is empty —
+    so a burst of up to 40 goes straight through, and after that we settle
+    at TMDB's sustained rate instead of being answered with 429s.
+
+    The adapter only sees requests that actually go over the network:
+    cache hits are answered by requests-cache before they get here, so
+    they never wait.  Image downloads aren't counted either (they come
+    from TMDB's CDN, not the rate-limited API).
     """
-    return {"api_key": TMDB_API_KEY}
-
 
-def search_multi(query):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rate = TMDB_RATE_LIMIT / TMDB_RATE_PERIOD  # Tokens per second
+        self._tokens = float(TMDB_RATE_LIMIT)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _wait_for_token(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(TMDB_RATE_LIMIT, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # Take our token now, even if it leaves the bucket in debt —
+            # that's how each waiting thread gets its own place in the queue
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)  # Sleep outside the lock, so others can queue up
+
+    def send(self, request, **kwargs):
+        if request.url.startswith(TMDB_BASE_URL):
+            self._wait_for_token()
+        return super().send(request, **kwargs)
+
+
+# Keep-alive connections to TMDB are pooled and reused between calls (so
+# only the first request pays for the TCP + TLS handshake).  The pool holds
+# enough connections for a full batch of parallel lookups plus the web
+# requests running alongside it, so none of them has to open (and then
+# throw away) an extra connection.  Brief hiccups —
+# rate limiting (429) or a flaky server (5xx) — are retried a couple of
+# times with a short backoff before we give up (normally the rate limiter
+# above keeps us from seeing 429s at all).
+_session.mount("https://", _RateLimitedAdapter(
+    pool_connections=4,
+    pool_maxsize=_MAX_PARALLEL + 12,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+))
+_session.headers["User-Agent"] = "teli/1.0"
+# Accept-Encoding is left to requests: with the brotli package installed
+# (see requirements.txt) it asks for "gzip, deflate, br", and TMDB's
+# Brotli-compressed JSON is noticeably smaller than gzip.  Setting it by
+# hand would break decoding on a machine where brotli is missing.
+
+# Threads for running several TMDB lookups at once (see search_single_batch).
+# Each lookup spends almost all its time waiting on the network, so a few
+# threads let them overlap.
+_POOL = ThreadPoolExecutor(max_workers=_MAX_PARALLEL)
+
+
+# Base query parameters included in every TMDB request.  The api_key
+# authenticates us with TMDB's v3 API; it never changes while the app runs,
+# so one shared dict will do (it's only ever copied, never modified).
+_BASE_PARAMS = {"api_key": TMDB_API_KEY}
+
+# The same api_key, already URL-encoded, for endpoints whose URL is the only
+# thing that changes between calls — saves building and encoding params
+# every time.
+_API_SUFFIX = "?api_key=" + quote(TMDB_API_KEY)
+
+
+# Results are small fixed-shape objects rather than dicts: with __slots__
+# each one is a compact array of fields instead of its own hash table, so
+# they're smaller and quicker to read.  Templates use them the same way
+# (r.title), and jsonify() turns them into the same JSON objects as before.
+@dataclass(slots=True)
+class SearchResult:
+    """One movie or TV show from a TMDB search."""
+    tmdb_id: int
+    media_type: str
+    title: str
+    year: str
+    poster_url: str | None
+    poster_path: str | None   # Stored in the database; poster_url is for display
+    overview: str
+    # Filled in by the app for the current user (see _mark_on_list in app.py)
+    on_list: bool = False
+    list_id: int | None = None
+
+
+@dataclass(slots=True)
+class ProviderResult:
+    """One streaming service offering a title (see get_providers)."""
+    name: str
+    logo: str | None   # TMDB's path for the logo, e.g. "/abc123.jpg" (see logo_url)
+    type: str      # "stream", "rent" or "buy"
+    country: str
+
+
+def search_multi(query, limit=None):
     """
     Search for movies AND TV shows in one call.
 
-    Returns a list of results, each with:
+    Returns a list of SearchResults (at most `limit` of them, if given),
+    each with:
     - tmdb_id, media_type, title, year, poster_url, overview
 
     We filter out results that aren't movies or TV shows
@@ -36,28 +187,96 @@ def search_multi(query):
     if not query or not query.strip():
         return []
 
+    try:
+        # TMDB search ignores case and surrounding spaces, so neither should
+        # our cache: "Inception " and "inception" are the same lookup
+        cached = _search_multi_shared(query.strip().lower())
+    except (requests.RequestException, ValueError):
+        return []  # Return empty list if API is down, key is invalid, or the reply isn't JSON
+
+    # Hand out copies, so callers can add fields (e.g. on_list) without
+    # changing what's cached — only of the results they asked for
+    return [copy.copy(result) for result in cached[:limit]]
+
+
+# Searches running right now, by query.  When several people (or several
+# threads of a batch import) search for the same thing at the same moment,
+# only the first goes to TMDB; the rest wait for its answer.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _search_multi_shared(query):
+    """
+    _search_multi_cached(), but sharing one lookup between callers that
+    ask for the same query at the same time.
+
+    lru_cache only helps once a search has finished — until then, every
+    caller would miss it and go to TMDB themselves.
+    """
+    with _inflight_lock:
+        future = _inflight.get(query)
+        first = future is None
+        if first:
+            future = _inflight[query] = Future()
+
+    if not first:
+        return future.result()  # Raises the same error, if the lookup failed
+
+    try:
+        # The time slot is part of the cache key, so remembered searches
+        # are dropped (and fetched again) every _SEARCH_MEMO_SECONDS
+        results = _search_multi_cached(query, int(time.monotonic() // _SEARCH_MEMO_SECONDS))
+    except BaseException as error:
+        future.set_exception(error)
+        raise
+    else:
+        future.set_result(results)
+        return results
+    finally:
+        with _inflight_lock:
+            del _inflight[query]
+
+
+# Recent searches in this worker process, answered without going to TMDB
+# (or even the HTTP cache) at all.  Only for a few minutes, though: after
+# that the search goes back through the HTTP cache, which keeps it for a
+# day and then checks with TMDB whether anything changed.
+_SEARCH_MEMO_SECONDS = 10 * 60
+
+
+@lru_cache(maxsize=1024)
+def _search_multi_cached(query, time_slot):
+    """
+    The real search behind search_multi(), remembered per query and
+    time_slot (which only changes every _SEARCH_MEMO_SECONDS).
+
+    Returns a tuple of SearchResults.  Errors are raised rather than returned,
+    so a failed lookup isn't remembered — the next search tries again.
+    """
     url = f"{TMDB_BASE_URL}/search/multi"
     params = {
-        **_base_params(),       # Includes the api_key
+        **_BASE_PARAMS,         # Includes the api_key
         "query": query,
         "include_adult": False,
         "language": "en-GB",    # Prefer British English titles
         "page": 1
     }
 
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()  # Raise an error if the request failed
-        data = response.json()
-    except requests.RequestException:
-        return []  # Return empty list if API is down or key is invalid
+    response = _session.get(url, params=params, timeout=10)
+    response.raise_for_status()  # Raise an error if the request failed
+    data = orjson.loads(response.content)  # Much faster than response.json()
 
+    # Copied into local names once, rather than looked up for every item
+    image_base = TMDB_IMAGE_BASE
     results = []
-    for item in data.get("results", []):
+    add = results.append
+
+    for item in data.get("results") or ():
         media_type = item.get("media_type")
 
-        # Skip anything that isn't a movie or TV show
-        if media_type not in ("movie", "tv"):
+        # Skip anything that isn't a movie or TV show (before doing any other work)
+        if media_type != "movie" and media_type != "tv":
             continue
 
         # Movies use "title" and "release_date", TV shows use "name" and "first_air_date"
@@ -73,19 +292,19 @@ def search_multi(query):
 
         # Build the full poster URL (or None if no poster)
         poster_path = item.get("poster_path")
-        poster_url = f"{TMDB_IMAGE_BASE}{poster_path}" if poster_path else None
+        poster_url = image_base + poster_path if poster_path else None
 
-        results.append({
-            "tmdb_id": item["id"],
-            "media_type": media_type,
-            "title": title,
-            "year": year,
-            "poster_url": poster_url,
-            "poster_path": poster_path,  # Store the path for the database
-            "overview": item.get("overview", ""),
-        })
+        add(SearchResult(
+            tmdb_id=item["id"],
+            media_type=media_type,
+            title=title,
+            year=year,
+            poster_url=poster_url,
+            poster_path=poster_path,
+            overview=item.get("overview", ""),
+        ))
 
-    return results
+    return tuple(results)
 
 
 def get_providers(tmdb_id, media_type):
@@ -95,45 +314,149 @@ def get_providers(tmdb_id, media_type):
     TMDB's "watch providers" endpoint tells us which services carry
     each title, broken down by country and type (stream, rent, buy).
 
-    Returns a list of dicts with: name, logo, type, country
+    Returns a list of ProviderResults: name, logo, type, country
     """
-    url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/watch/providers"
+    url = f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}/watch/providers{_API_SUFFIX}"
 
     try:
-        response = requests.get(url, params=_base_params(), timeout=10)
+        response = _session.get(url, timeout=10)
         response.raise_for_status()
-        data = response.json()
-    except requests.RequestException:
+        data = orjson.loads(response.content)
+    except (requests.RequestException, ValueError):
         return []
 
     # The results are nested by country code
-    country_data = data.get("results", {}).get(PROVIDER_COUNTRY, {})
+    return _parse_providers(data.get("results", {}).get(PROVIDER_COUNTRY, {}))
+
+
+# TMDB uses different keys for different types of availability,
+# in the order we list them:
+# "flatrate" = streaming subscription (Netflix, Disney+, etc.)
+# "rent"     = pay-per-view rental (Amazon, Apple TV, etc.)
+# "buy"      = digital purchase
+_PROVIDER_TYPES = (("flatrate", "stream"), ("rent", "rent"), ("buy", "buy"))
+
+
+def _parse_providers(country_data):
+    """
+    Turn one country's block of TMDB watch-provider data into our list of
+    ProviderResults (name, logo, type, country).
+    """
     if not country_data:
         return []
 
-    providers = []
+    # Copied into local names once, rather than looked up for every provider
+    country = PROVIDER_COUNTRY
+    get_type = country_data.get
 
-    # TMDB uses different keys for different types of availability:
-    # "flatrate" = streaming subscription (Netflix, Disney+, etc.)
-    # "rent"     = pay-per-view rental (Amazon, Apple TV, etc.)
-    # "buy"      = digital purchase
-    type_mapping = {
-        "flatrate": "stream",
-        "rent": "rent",
-        "buy": "buy"
-    }
+    return [
+        ProviderResult(
+            name=provider.get("provider_name", "Unknown"),
+            logo=provider.get("logo_path"),
+            type=display_type,
+            country=country,
+        )
+        for tmdb_key, display_type in _PROVIDER_TYPES
+        for provider in get_type(tmdb_key, ())
+    ]
+
+
+# Logos already saved in PROVIDER_LOGO_DIR (so we don't have to check the
+# disk every time), and downloads that are queued or running (see
+# logo_url).  Both hold "size/filename" strings, e.g. "w45/abc123.jpg".
+_logos_saved = set()
+_logos_pending = set()
+_logos_lock = threading.Lock()
+
+
+def logo_url(logo, size="w500"):
+    """
+    The URL to show for a provider logo — used as a template filter:
+        {{ p.provider_logo | logo_url }}          full size
+        {{ p.provider_logo | logo_url("w45") }}   small, for chips
+
+    `logo` is what we store for a provider: TMDB's path for the image
+    (e.g. "/abc123.jpg"), or a full URL saved by an older version of the
+    app.  Either way only the file name matters.  `size` is one of TMDB's
+    image sizes; each size is saved separately, in its own folder.
+
+    If we've already saved the logo into static/providers, that's our own
+    URL.  Otherwise the download is started in the background and, until
+    it lands, the TMDB URL is used instead.  Working this out when the page
+    is shown (rather than when the providers are saved) means a title
+    switches to our own copy as soon as it exists.
+    """
+    if not logo:
+        return None
+    name = f"{size}/{os.path.basename(logo)}"
+    if name in _logos_saved:
+        return PROVIDER_LOGO_URL + name
+    if os.path.exists(os.path.join(PROVIDER_LOGO_DIR, name)):
+        _logos_saved.add(name)
+        return PROVIDER_LOGO_URL + name
+
+    with _logos_lock:
+        if name not in _logos_pending:
+            _logos_pending.add(name)
+            _POOL.submit(_download_logo, name)
+    return f"{_IMAGE_ROOT}/{name}"
+
+
+def _download_logo(name):
+    """Save one provider logo ("size/filename") from TMDB into PROVIDER_LOGO_DIR."""
+    try:
+        # (The session skips its response cache for images — the file is the cache)
+        response = _session.get(f"{_IMAGE_ROOT}/{name}", timeout=10)
+        response.raise_for_status()
+
+        # Write to a temporary name, then rename: nobody ever sees half a file
+        final_path = os.path.join(PROVIDER_LOGO_DIR, name)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        temp_path = f"{final_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(temp_path, final_path)
+        _logos_saved.add(name)
+    except (requests.RequestException, OSError):
+        pass  # Keep using the TMDB URL; we'll try again next time it's seen
+    finally:
+        with _logos_lock:
+            _logos_pending.discard(name)
+
+
+def _warm_up_connection():
+    """Make one small request to TMDB, just to open a connection."""
+    try:
+        _session.get(f"{TMDB_BASE_URL}/configuration{_API_SUFFIX}", timeout=5)
+    except requests.RequestException:
+        pass  # No harm done — the first real request will connect instead
 
-    for tmdb_key, display_type in type_mapping.items():
-        for provider in country_data.get(tmdb_key, []):
-            logo_path = provider.get("logo_path")
-            providers.append({
-                "name": provider.get("provider_name", "Unknown"),
-                "logo": f"{TMDB_IMAGE_BASE}{logo_path}" if logo_path else None,
-                "type": display_type,
-                "country": PROVIDER_COUNTRY
-            })
 
-    return providers
+# The process that has already started warming up (see warm_up)
+_warmed_up_pid = None
+_warm_up_lock = threading.Lock()
+
+
+def warm_up():
+    """
+    Open a connection to TMDB in the background, ready for the first search.
+
+    A new connection costs a TCP + TLS handshake (a few hundred ms).  Call
+    this early in each worker process so that cost is paid before anyone
+    is waiting, and the first user's search reuses the pooled connection.
+    Only the first call in a process does anything.
+
+    Call it from a worker (e.g. on its first request), not while the app
+    is being loaded: servers that load the app once and then fork workers
+    would otherwise share one socket between them.  The request runs on
+    its own short-lived thread, not _POOL, for the same reason.
+    """
+    global _warmed_up_pid
+    with _warm_up_lock:
+        if _warmed_up_pid == os.getpid():
+            return
+        _warmed_up_pid = os.getpid()
+    threading.Thread(target=_warm_up_connection, daemon=True).start()
 
 
 def search_single(query):
@@ -142,5 +465,25 @@ def search_single(query):
 
     Returns the top result or None if nothing matches.
     """
-    results = search_multi(query)
+    results = search_multi(query, limit=1)
     return results[0] if results else None
+
+
+def _safe_search_single(query):
+    """search_single() for use in the thread pool — one bad lookup shouldn't sink the batch."""
+    try:
+        return search_single(query)
+    except Exception:
+        return None
+
+
+def search_single_batch(queries):
+    """
+    Find the best match for each of several titles at the same time —
+    used during batch import.
+
+    Returns one result (or None if nothing matched) per query, in the
+    same order.  Runs on the shared thread pool, so at most _MAX_PARALLEL
+    lookups are in flight however many titles are pasted in.
+    """
+    return list(_POOL.map(_safe_search_single, queries))
@@ -3,15 +3,44 @@ WSGI entry point for PythonAnywhere.
 
 PythonAnywhere doesn't run app.py directly — instead it uses WSGI
 (Web Server Gateway Interface), a standard way for web servers to
-talk to Python apps. This file imports your Flask app and makes sure
-the database is ready before handling any requests.
+talk to Python apps. This file just imports your Flask app.
 
 You'll point PythonAnywhere's WSGI configuration to this file.
+
+The database is created (or upgraded after pulling schema changes) when
+this file is loaded.  If it's already up to date that's one quick check,
+so reloading costs nothing.  You can also do it by hand, from a Bash
+console in the project folder:
+
+    flask --app app init-db
+
+It also works with gunicorn.  Using gevent workers lets one worker serve
+other requests while it waits on TMDB.  With more than one worker, the
+page cache has to be shared too (CACHE_TYPE, see config.py) — otherwise
+a change made through one worker isn't seen by the others for a minute:
+
+    pip install gunicorn gevent
+    export CACHE_TYPE=FileSystemCache
+    TELI_GEVENT=1 gunicorn -k gevent -w 2 --worker-connections 100 wsgi:app
 """
 
+import os
+
+# gevent has to patch the standard library (sockets, threads, ...) before
+# anything else imports it, so this comes first.
+if os.environ.get("TELI_GEVENT") == "1":
+    from gevent import monkey
+    monkey.patch_all()
+
 from app import app
 from database import init_db
 
-# Create database tables if they don't exist yet.
-# This runs once when PythonAnywhere loads your app.
+# Create or upgrade the database tables if the schema has changed
 init_db()
+
+# Connect to TMDB in the background as soon as each worker gets its first
+# request, so the first search doesn't have to wait for the TLS handshake.
+# (Not right here: some servers import this file once and then fork the
+# workers, which would all end up sharing one connection.)
+import tmdb
+app.before_request(tmdb.warm_up)